@@ -1,5 +1,10 @@
 import math
 
+import mediapipe as mp
+
+# ลำดับ landmark ของ mediapipe pose ที่ใช้คำนวณมุม
+PL = mp.solutions.pose.PoseLandmark
+
 class Cal_function():
     def __init__(self):
         pass
@@ -52,4 +57,28 @@ class Cal_function():
         ))
 
         return angle
-    
+
+    def pose_angles(self, xy, mask):
+        """
+        คำนวณมุม Neck / Arm / Body / Leg จากตำแหน่ง landmark (33, 2)
+        มุมที่ต้องใช้จุดที่ถูก mask (มองไม่เห็น) จะคืนค่าเป็น nan
+        """
+        def g(i): return float(xy[i][0]), float(xy[i][1])
+
+        def ok(*idx): return all(mask[i] for i in idx)
+
+        nan = float("nan")
+        ls, rs = g(PL.LEFT_SHOULDER), g(PL.RIGHT_SHOULDER)
+        center = ((ls[0] + rs[0]) / 2, (ls[1] + rs[1]) / 2)
+        hip = g(PL.LEFT_HIP)
+
+        neck = self.angle_3pt(ls, center, g(PL.NOSE)) \
+            if ok(PL.LEFT_SHOULDER, PL.RIGHT_SHOULDER, PL.NOSE) else nan
+        arm = self.angle_3pt(ls, g(PL.LEFT_ELBOW), g(PL.LEFT_WRIST)) \
+            if ok(PL.LEFT_SHOULDER, PL.LEFT_ELBOW, PL.LEFT_WRIST) else nan
+        body = abs(math.degrees(math.atan2(center[0] - hip[0], center[1] - hip[1]))) \
+            if ok(PL.LEFT_SHOULDER, PL.RIGHT_SHOULDER, PL.LEFT_HIP) else nan
+        leg = self.angle_3pt(hip, g(PL.LEFT_KNEE), g(PL.LEFT_ANKLE)) \
+            if ok(PL.LEFT_HIP, PL.LEFT_KNEE, PL.LEFT_ANKLE) else nan
+
+        return neck, arm, body, leg
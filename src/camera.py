@@ -1,36 +1,343 @@
+import re
+import shutil
+import subprocess
+import sys
+
 import cv2
 
+# ความละเอียดที่ใช้ลองเมื่อไม่มี v4l2-ctl ให้ถามรายการโหมดจาก driver
+PROBE_SIZES = [(320, 240), (640, 480), (800, 600), (1280, 720), (1920, 1080)]
+PROBE_FOURCCS = ["MJPG", "YUYV"]
+# ขอ fps สูงไว้ก่อน driver จะลดลงเหลือค่าสูงสุดที่ทำได้ในโหมดนั้น
+PROBE_FPS = 60
+
+
+def default_backend():
+    """
+    เลือก backend ของ OpenCV ตาม platform
+    """
+    if sys.platform.startswith("win"):
+        return cv2.CAP_DSHOW
+    if sys.platform.startswith("linux"):
+        return cv2.CAP_V4L2
+    if sys.platform == "darwin":
+        return cv2.CAP_AVFOUNDATION
+    return cv2.CAP_ANY
+
+
+def fourcc_to_str(value):
+    value = int(value)
+    return "".join(chr((value >> (8 * i)) & 0xFF) for i in range(4))
+
+
+def _v4l2_modes(camera):
+    """
+    อ่านโหมดที่กล้องรองรับจาก `v4l2-ctl --list-formats-ext`
+    คืนค่า list ของ (fourcc, width, height, fps) หรือ None ถ้าใช้ไม่ได้
+    """
+    if not shutil.which("v4l2-ctl"):
+        return None
+
+    device = f"/dev/video{camera}" if isinstance(camera, int) else str(camera)
+    try:
+        out = subprocess.run(
+            ["v4l2-ctl", "-d", device, "--list-formats-ext"],
+            capture_output=True, text=True, timeout=5,
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+    modes = []
+    fourcc, size = None, None
+    for line in out.splitlines():
+        # FOURCC อาจมีช่องว่าง เช่น 'Y16 ', 'Z16 '
+        m = re.search(r"\[\d+\]: '(.{4})'", line)
+        if m:
+            fourcc, size = m.group(1).strip(), None
+            continue
+        m = re.search(r"Size: \w+ (\d+)x(\d+)", line)
+        if m:
+            size = (int(m.group(1)), int(m.group(2)))
+            continue
+        m = re.search(r"\(([\d.]+) fps\)", line)
+        if m and fourcc and size:
+            modes.append((fourcc, size[0], size[1], float(m.group(1))))
+
+    return modes or None
+
+
+def _probe_modes(camera, backend):
+    """
+    ลองตั้งค่าทีละโหมดแล้วอ่านค่ากลับ ใช้กับ platform ที่ไม่มี v4l2-ctl
+    ช้ามากบน DSHOW (สร้าง graph ใหม่ทุกครั้งที่เปลี่ยนค่า) จึงไม่ถูกเรียกอัตโนมัติตอน add_camera
+    """
+    cap = cv2.VideoCapture(camera, backend)
+    if not cap.isOpened():
+        return []
+
+    modes = set()
+    for fourcc in PROBE_FOURCCS:
+        for width, height in PROBE_SIZES:
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            cap.set(cv2.CAP_PROP_FPS, PROBE_FPS)
+            modes.add((
+                fourcc_to_str(cap.get(cv2.CAP_PROP_FOURCC)),
+                int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                float(cap.get(cv2.CAP_PROP_FPS)),
+            ))
+    cap.release()
+    return sorted(modes)
+
+
+_modes_cache = {}
+
+
+def list_modes(camera, backend=None, refresh=False):
+    """
+    รายการโหมด (fourcc, width, height, fps) ที่กล้องรองรับจริง
+    ผลลัพธ์ถูก cache ไว้ต่อ (camera, backend) เพราะการ probe ใช้เวลานาน
+    """
+    if backend is None:
+        backend = default_backend()
+
+    key = (camera, backend)
+    if key in _modes_cache and not refresh:
+        return _modes_cache[key]
+
+    modes = _v4l2_modes(camera) if backend == cv2.CAP_V4L2 else None
+    if not modes:
+        modes = _probe_modes(camera, backend)
+
+    _modes_cache[key] = modes
+    return modes
+
+
+def pick_mode(modes, width, height, fps, fourcc):
+    """
+    เลือกโหมดที่ใกล้กับค่าที่ขอที่สุด
+    เรียงตาม: fourcc ตรง > ความละเอียดใกล้ > fps ถึงค่าที่ขอ > fps ใกล้
+    """
+    if not modes:
+        return None
+
+    def score(mode):
+        m_fourcc, m_w, m_h, m_fps = mode
+        return (
+            m_fourcc != fourcc,
+            abs(m_w * m_h - width * height),
+            m_fps < fps,
+            abs(m_fps - fps),
+        )
+
+    return min(modes, key=score)
+
+
 class camera_module():
 
-    def __init__(self):
+    def __init__(self, width=640, height=480, fps=30, fourcc="MJPG",
+                 buffer_size=1, exposure=None, backend=None, negotiate=None):
+        """
+        exposure: None = ปล่อย auto, "lock" = ล็อกค่าปัจจุบัน, ตัวเลข = ตั้งค่าเอง
+        backend: None = เลือกตาม platform (ดู default_backend)
+        negotiate: None = เลือกโหมดจาก v4l2-ctl เมื่อมีให้ใช้, True = probe ทุก platform (ช้า), False = ไม่เลือก
+        """
         self.cap = None
         self.ret, self.frame = None, None
+        self.settings = {
+            "width": width,
+            "height": height,
+            "fps": fps,
+            "fourcc": fourcc,
+            "buffer_size": buffer_size,
+            "exposure": exposure,
+            "backend": backend,
+            "negotiate": negotiate,
+        }
+        # โหมดที่ driver ยอมรับจริง (fourcc, width, height, fps)
+        self.mode = None
+        # การอัดวิดีโอ (ใช้ตอน review) แบ่งเป็นไฟล์ย่อย (segment) ทีละ segment_frames เฟรม
+        # frame_index = ลำดับ (นับต่อเนื่องทุก segment) ของเฟรมล่าสุดที่ส่งเข้า write_record
+        #               None = เฟรมนั้นไม่ได้ถูกเขียน
+        self.writer = None
+        self.record_base = None
+        self.record_codec = None
+        self.record_size = None
+        self.segment_frames = 0
+        self.segment_path = None
+        self.segment_first = 0
+        self.segment_count = 0
+        self.frames_written = 0
+        self.frame_index = None
+        # segment ที่เพิ่งเปิด (first_frame, path) ให้ผู้เรียกเอาไปบันทึก ดู pop_segment()
+        self.new_segments = []
+
+    def add_camera(self, camera, **settings):
+        cfg = dict(self.settings, **settings)
+        backend = cfg["backend"] if cfg["backend"] is not None else default_backend()
+
+        # ถามโหมดก่อนเปิดกล้อง เพราะบาง driver ไม่ยอมให้เปิด device ซ้อนกัน
+        negotiate = cfg["negotiate"]
+        if negotiate is None:
+            negotiate = backend == cv2.CAP_V4L2 and shutil.which("v4l2-ctl") is not None
+        if negotiate:
+            mode = pick_mode(list_modes(camera, backend), cfg["width"], cfg["height"],
+                             cfg["fps"], cfg["fourcc"])
+            if mode:
+                cfg["fourcc"], cfg["width"], cfg["height"], cfg["fps"] = mode
 
-    def add_camera(self, camera):
-        self.cap = cv2.VideoCapture(camera, cv2.CAP_DSHOW)
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        self.cap = cv2.VideoCapture(camera, backend)
+        if not self.cap.isOpened():
+            return self.cap
+
+        self.configure(cfg, backend)
         return self.cap
-    
+
+    def configure(self, cfg, backend):
+        # V4L2 ต้องตั้ง FOURCC ก่อนขนาดภาพ ไม่อย่างนั้น driver จะย้อนกลับไปใช้ YUYV
+        if cfg["fourcc"]:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*cfg["fourcc"]))
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, cfg["width"])
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, cfg["height"])
+        if cfg["fps"]:
+            self.cap.set(cv2.CAP_PROP_FPS, cfg["fps"])
+        if cfg["buffer_size"]:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, cfg["buffer_size"])
+
+        if cfg["exposure"] is not None:
+            self.lock_exposure(cfg["exposure"], backend)
+
+        self.mode = (
+            fourcc_to_str(self.cap.get(cv2.CAP_PROP_FOURCC)),
+            int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            float(self.cap.get(cv2.CAP_PROP_FPS)),
+        )
+
+    def lock_exposure(self, exposure, backend):
+        """
+        ปิด auto exposure แล้วใช้ค่าคงที่
+        ค่า manual ของ CAP_PROP_AUTO_EXPOSURE ต่างกันตาม backend (V4L2 = 1, DSHOW/MSMF = 0.25)
+        "lock" แค่ปิด auto ให้ driver คงค่าปัจจุบันไว้ ไม่อ่าน CAP_PROP_EXPOSURE
+        เพราะหลาย driver คืนค่า manual เก่าขณะที่ auto ยังเปิดอยู่
+        """
+        manual = 1 if backend == cv2.CAP_V4L2 else 0.25
+        self.cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, manual)
+        if exposure != "lock":
+            self.cap.set(cv2.CAP_PROP_EXPOSURE, exposure)
+
+    def mode_text(self):
+        if not self.mode:
+            return "-"
+        fourcc, w, h, fps = self.mode
+        return f"{fourcc} {w}x{h}@{fps:.0f}"
+
+    def start_record(self, path_base, codec="MJPG", segment_frames=1800):
+        """
+        อัดเฟรมดิบ (ก่อนวาดโครงร่าง) ลงไฟล์ <path_base>_0000.avi, _0001.avi, ... ใช้กับโหมด review
+        - ไฟล์ที่ปิดแล้วมี index ครบ seek ได้ ถ้าโปรแกรม crash เสียแค่ segment สุดท้าย
+          (ยังอ่านไล่จากต้นได้เพราะเป็น MJPG ใน AVI ต่างจาก mp4 ที่ไม่มี moov จะเปิดไม่ได้เลย)
+        - MJPG ทุกเฟรมเป็น keyframe
+        """
+        _, w, h, _ = self.mode if self.mode else (None, 640, 480, 30)
+        self.record_base = path_base
+        self.record_codec = codec
+        self.record_size = (w, h)
+        self.segment_frames = segment_frames
+        self.segment_count = 0
+        self.frames_written = 0
+        self.frame_index = None
+        self.new_segments = []
+        self.writer = self._open_segment()
+        return self.writer is not None
+
+    def _next_segment_path(self):
+        return f"{self.record_base}_{self.segment_count:04d}.avi"
+
+    def _open_writer(self, path):
+        fps = self.mode[3] if self.mode and self.mode[3] else 30
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*self.record_codec),
+                                 fps, self.record_size)
+        if not writer.isOpened():
+            writer.release()
+            return None
+        return writer
+
+    def _open_segment(self):
+        path = self._next_segment_path()
+        writer = self._open_writer(path)
+        if writer:
+            self.segment_path = path
+            self.segment_first = self.frames_written
+            self.segment_count += 1
+            self.new_segments.append((self.segment_first, path))
+        return writer
+
+    def pop_segment(self):
+        """
+        คืน segment ที่เปิดใหม่ตั้งแต่เรียกครั้งก่อน [(first_frame, path), ...]
+        """
+        segments, self.new_segments = self.new_segments, []
+        return segments
+
+    def write_record(self, frame):
+        """
+        คืนลำดับเฟรม หรือ None ถ้าไม่ได้เขียน
+        VideoWriter ทิ้งเฟรมที่ขนาดไม่ตรงแบบเงียบๆ จึงต้องเช็กเอง:
+        เฟรมแรกที่ขนาดต่างจาก mode -> เปิด writer ใหม่ตามขนาดจริง (ไฟล์เดิม)
+        หลังจากนั้นเฟรมที่ขนาดไม่ตรงจะถูกข้ามและไม่นับลำดับ
+        """
+        self.frame_index = None
+        if not self.writer:
+            return None
+
+        size = (frame.shape[1], frame.shape[0])
+        if size != self.record_size:
+            if self.frames_written:
+                return None
+            self.writer.release()
+            self.record_size = size
+            self.writer = self._open_writer(self.segment_path)
+            if not self.writer:
+                return None
+
+        if self.frames_written - self.segment_first >= self.segment_frames:
+            self.writer.release()
+            self.writer = self._open_segment()
+            if not self.writer:
+                return None
+
+        self.writer.write(frame)
+        self.frame_index = self.frames_written
+        self.frames_written += 1
+        return self.frame_index
+
+    def stop_record(self):
+        if self.writer:
+            self.writer.release()
+            self.writer = None
+
     def chcel_camera(self):
         if not self.cap:
             return
-        
+
         self.ret, self.frame = self.cap.read()
 
         if not self.ret:
             return
-        
+
         return self.frame
-        
+
     def color_images(self):
         bgr_t_rgb = cv2.cvtColor(self.frame, cv2.COLOR_BGR2RGB)
         return bgr_t_rgb
-    
+
     def isopen_cam(self):
         if self.cap.isOpened():
             return True
         else:
             return False
     def cap_release(self):
-        self.cap.release()
\ No newline at end of file
+        self.cap.release()
@@ -1,4 +1,30 @@
+import cv2
 import mediapipe as mp
+import numpy as np
+
+
+def landmarks_array(landmarks):
+    """
+    แปลง pose_landmarks เป็น array (33, 4): x, y, z, visibility (x, y เป็นสัดส่วนของภาพ)
+    """
+    return np.array([(p.x, p.y, p.z, p.visibility) for p in landmarks.landmark], dtype=np.float32)
+
+
+def draw_landmarks_array(frame, points, min_visibility=0.5):
+    """
+    วาดโครงร่างจาก array ที่บันทึกไว้ (ไม่ต้องรัน mediapipe ซ้ำ) สีเดียวกับตอน live
+    """
+    h, w = frame.shape[:2]
+    xy = (points[:, :2] * (w, h)).astype(int).tolist()
+    visible = points[:, 3] >= min_visibility
+
+    for a, b in mp.solutions.pose.POSE_CONNECTIONS:
+        if visible[a] and visible[b]:
+            cv2.line(frame, tuple(xy[a]), tuple(xy[b]), (0, 0, 255), 2)
+    for i in np.flatnonzero(visible).tolist():
+        cv2.circle(frame, tuple(xy[i]), 3, (0, 255, 0), 3)
+    return frame
+
 
 class module_detection():
     def __init__(self):
@@ -6,21 +32,23 @@ class module_detection():
         self.pose = self.mp_pose.Pose(min_detection_confidence=0.5,
                                  min_tracking_confidence=0.5)
 
-    def process_images(self, frame, imagesRGB):
+    def process_images(self, frame, imagesRGB, draw=True):
+        # draw=False: ผู้เรียกวาดเองหลังกรอง landmark (ดู draw_landmarks_array)
         result = self.pose.process(imagesRGB)
         
         if result.pose_landmarks:
-            mp.solutions.drawing_utils.draw_landmarks(
-                frame,
-                result.pose_landmarks,
-                self.mp_pose.POSE_CONNECTIONS,
-                mp.solutions.drawing_utils.DrawingSpec(color=(0,255,0), thickness=3, circle_radius=3),
-                mp.solutions.drawing_utils.DrawingSpec(color=(0,0,255), thickness=2),
-            )
+            if draw:
+                mp.solutions.drawing_utils.draw_landmarks(
+                    frame,
+                    result.pose_landmarks,
+                    self.mp_pose.POSE_CONNECTIONS,
+                    mp.solutions.drawing_utils.DrawingSpec(color=(0,255,0), thickness=3, circle_radius=3),
+                    mp.solutions.drawing_utils.DrawingSpec(color=(0,0,255), thickness=2),
+                )
             return True, result.pose_landmarks
         else:
             return False, imagesRGB
 
     
     
-        
\ No newline at end of file
+        
\ No newline at end of file
@@ -0,0 +1,73 @@
+import math
+
+import numpy as np
+
+
+class landmark_filter():
+    """
+    One Euro filter ของ landmark ทั้ง 33 จุดพร้อมกันเป็น numpy array ต่อเฟรม
+    - min_cutoff: ความถี่ตัดต่ำสุด (Hz) ยิ่งต่ำยิ่งนิ่งตอนอยู่กับที่
+    - beta: เพิ่ม cutoff ตามความเร็ว ยิ่งสูงยิ่งหน่วงน้อยตอนขยับเร็ว (หน่วย pixel/s)
+    - min_visibility: จุดที่ visibility ต่ำกว่านี้ถูก mask และไม่ใช้อัปเดต state
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.007, d_cutoff=1.0, min_visibility=0.5):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.min_visibility = min_visibility
+        self.reset()
+
+    def reset(self):
+        self.x_hat = None
+        self.dx_hat = None
+        self.t_prev = None
+        # จุดที่ยังไม่เคยเห็นหรือเพิ่งหายไป -> เริ่ม state ใหม่เมื่อกลับมา
+        self.valid = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def filter(self, xy, visibility, t):
+        """
+        xy: (33, 2) ตำแหน่ง pixel, visibility: (33,), t: เวลาเป็นวินาที
+        คืน (xy ที่กรองแล้ว, mask ของจุดที่เชื่อถือได้)
+        """
+        xy = np.asarray(xy, dtype=np.float64)
+        mask = np.asarray(visibility) >= self.min_visibility
+
+        if self.x_hat is None:
+            self.x_hat = xy.copy()
+            self.dx_hat = np.zeros_like(xy)
+            self.valid = mask.copy()
+            self.t_prev = t
+            return self.x_hat.copy(), mask
+
+        dt = t - self.t_prev
+        if dt <= 0:
+            dt = 1.0 / 30
+        self.t_prev = t
+
+        # จุดที่กลับมามองเห็นหลังหายไป ไม่ควรถูกดึงจากตำแหน่งเก่า
+        fresh = mask & ~self.valid
+        self.x_hat[fresh] = xy[fresh]
+        self.dx_hat[fresh] = 0.0
+
+        dx = (xy - self.x_hat) / dt
+        a_d = self._alpha(self.d_cutoff, dt)
+        dx_hat = self.dx_hat + a_d * (dx - self.dx_hat)
+
+        speed = np.hypot(dx_hat[:, 0], dx_hat[:, 1])
+        tau = 1.0 / (2 * np.pi * (self.min_cutoff + self.beta * speed))
+        a = (1.0 / (1.0 + tau / dt))[:, None]
+        x_hat = self.x_hat + a * (xy - self.x_hat)
+
+        # อัปเดต state เฉพาะจุดที่มองเห็น จุดที่ถูก mask คงค่าเดิมไว้
+        upd = mask[:, None]
+        self.x_hat = np.where(upd, x_hat, self.x_hat)
+        self.dx_hat = np.where(upd, dx_hat, self.dx_hat)
+        self.valid = mask
+
+        return self.x_hat.copy(), mask
@@ -0,0 +1,316 @@
+import bisect
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+class frame_cache():
+    """
+    LRU cache ของเฟรมที่ decode แล้ว จำกัดด้วยจำนวน byte (ไม่ใช่จำนวนเฟรม)
+    ใช้ร่วมกันระหว่าง UI thread กับ thread prefetch
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+        # เฟรมที่กำลังแสดงอยู่ ห้าม evict
+        self.pinned = None
+
+    def get(self, index):
+        with self._lock:
+            frame = self._frames.get(index)
+            if frame is not None:
+                self._frames.move_to_end(index)
+            return frame
+
+    def put(self, index, frame):
+        with self._lock:
+            old = self._frames.pop(index, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._frames[index] = frame
+            self.nbytes += frame.nbytes
+            while self.nbytes > self.max_bytes and len(self._frames) > 1:
+                oldest = next(iter(self._frames))
+                if oldest == self.pinned:
+                    self._frames.move_to_end(oldest)
+                    continue
+                self.nbytes -= self._frames.pop(oldest).nbytes
+
+    def __contains__(self, index):
+        with self._lock:
+            return index in self._frames
+
+
+def _header_frame_count(path):
+    cap = cv2.VideoCapture(path)
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return max(count, 0)
+
+
+def build_keyframe_index(path):
+    """
+    หาลำดับ keyframe และจำนวนเฟรมของไฟล์โดยอ่านแค่ packet (ไม่ decode) ผ่าน FFmpeg backend
+    จำนวนเฟรมนับจาก packet จริง เพราะไฟล์ที่อัดค้างตอนโปรแกรม crash มี header ผิด (0 หรือค่าขยะ)
+    และไฟล์แบบนั้น seek ไม่ได้ (OpenCV เมิน CAP_PROP_POS_FRAMES) จึงคืน keyframe เป็น [0]
+    ให้อ่านไล่จากต้นไฟล์แทน
+    ผลลัพธ์ถูกเก็บเป็น <path>.kfi.npz เพื่อไม่ต้องสแกนไฟล์ยาวซ้ำ
+    ถ้า OpenCV รุ่นนี้อ่าน flag keyframe ไม่ได้ จะคืน [0] (ทุกการ seek ให้ OpenCV จัดการเอง)
+    คืน (keyframes, frame_count)
+    """
+    index_path = path + ".kfi.npz"
+    if os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(path):
+        data = np.load(index_path)
+        return data["keyframes"].tolist(), int(data["count"])
+
+    header_count = _header_frame_count(path)
+    has_key = getattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME", None)
+    if has_key is None:
+        return [0], header_count
+
+    cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG)
+    if not cap.isOpened() or not cap.set(cv2.CAP_PROP_FORMAT, -1):
+        cap.release()
+        return [0], header_count
+
+    keyframes = []
+    index = 0
+    while cap.grab():
+        if cap.get(has_key):
+            keyframes.append(index)
+        index += 1
+    cap.release()
+
+    if not keyframes or header_count != index:
+        keyframes = [0]
+    np.savez(index_path, keyframes=np.array(keyframes, dtype=np.int64), count=index)
+    return keyframes, index
+
+
+def load_segments(segments):
+    """
+    [(first_frame, path), ...] -> [(first_frame, path, keyframes, count), ...]
+    ข้าม segment ที่ว่าง (เช่นเปิด writer ไม่สำเร็จ)
+    """
+    loaded = []
+    for first, path in segments:
+        if not os.path.exists(path):
+            continue
+        keyframes, count = build_keyframe_index(path)
+        if count > 0:
+            loaded.append((first, path, keyframes, count))
+    return loaded
+
+
+class video_reader():
+    """
+    อ่านเฟรมแบบสุ่มตำแหน่งข้ามหลาย segment โดยใช้ keyframe index
+    - ถ้าเฟรมที่ขออยู่ข้างหน้าใน segment เดิมและไม่ข้าม keyframe ถัดไป -> grab ต่อไปเรื่อยๆ ไม่ต้อง seek
+    - ไม่อย่างนั้น seek ไปที่ keyframe ก่อนหน้าแล้ว decode ต่อ
+    - keyframe ที่ต้นไฟล์ -> เปิดไฟล์ใหม่แทน seek (ใช้ได้กับไฟล์ที่ crash และ seek ไม่ได้)
+    ลำดับเฟรมเป็นลำดับรวมของ session
+    แต่ละ thread ต้องมี video_reader ของตัวเอง
+    """
+
+    def __init__(self, segments):
+        self.segments = segments
+        self.starts = [seg[0] for seg in segments]
+        self.count = segments[-1][0] + segments[-1][3] if segments else 0
+        self.cap = None
+        self.current = None
+        # ลำดับเฟรมที่จะได้จาก grab() ครั้งถัดไป
+        self.pos = 0
+
+    def _segment(self, index):
+        return max(bisect.bisect_right(self.starts, index) - 1, 0)
+
+    def _open(self, i):
+        if self.cap is not None:
+            self.cap.release()
+        self.cap = cv2.VideoCapture(self.segments[i][1])
+        self.current = i
+        self.pos = self.segments[i][0]
+
+    def keyframe_before(self, index):
+        first, _, keyframes, _ = self.segments[self._segment(index)]
+        i = bisect.bisect_right(keyframes, index - first) - 1
+        return first + keyframes[max(i, 0)]
+
+    def seek(self, index):
+        i = self._segment(index)
+        key = self.keyframe_before(index)
+        if self.current == i and key <= self.pos <= index:
+            return
+        first = self.segments[i][0]
+        if key == first:
+            self._open(i)
+        else:
+            if self.current != i:
+                self._open(i)
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, key - first)
+            self.pos = key
+
+    def _advance(self):
+        # ข้ามไป segment ถัดไปเมื่ออ่านจนสุดไฟล์
+        if self.pos >= self.count:
+            return False
+        i = self._segment(self.pos)
+        if self.current != i:
+            self._open(i)
+        return True
+
+    def read(self):
+        """
+        อ่านเฟรมที่ตำแหน่งปัจจุบัน คืน (index, frame) หรือ (index, None) เมื่อจบ
+        """
+        index = self.pos
+        if not self._advance():
+            return index, None
+        ok, frame = self.cap.read()
+        if not ok:
+            return index, None
+        self.pos += 1
+        return index, frame
+
+    def read_at(self, index):
+        self.seek(index)
+        while self.pos < index:
+            if not self._advance() or not self.cap.grab():
+                return None
+            self.pos += 1
+        return self.read()[1]
+
+    def frame_size(self):
+        if not self.segments:
+            return (0, 0), 30
+        cap = cv2.VideoCapture(self.segments[0][1])
+        size = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        cap.release()
+        return size, fps
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+class review_session():
+    """
+    รวม cache + prefetch + thumbnail ของวิดีโอหนึ่ง session (segments = [(first_frame, path), ...])
+    UI เรียก get_frame() / set_playhead() จาก main thread
+    thread ด้านหลัง decode รอบๆ playhead ไว้ใน cache ล่วงหน้า
+    """
+
+    def __init__(self, segments, max_bytes=512 * 1024 * 1024, ahead=60, behind=30,
+                 thumbnails=40, thumb_width=120):
+        self.segments = load_segments(segments)
+        self.cache = frame_cache(max_bytes)
+        self.reader = video_reader(self.segments)
+        self.count = self.reader.count
+        (w, h), self.fps = self.reader.frame_size()
+
+        # หน้าต่าง prefetch ต้องไม่เกินจำนวนเฟรมที่ cache จุได้ (เผื่อเฟรมที่แสดงอยู่ 1 เฟรม)
+        # ไม่อย่างนั้นรอบหลังจะไล่เฟรมรอบ playhead ที่เพิ่ง decode ออกไป
+        frame_bytes = max(w * h * 3, 1)
+        capacity = max(max_bytes // frame_bytes - 1, 0)
+        if ahead + behind > capacity:
+            ahead, behind = capacity * ahead // (ahead + behind), capacity * behind // (ahead + behind)
+        self.ahead = ahead
+        self.behind = behind
+        self.thumb_count = thumbnails
+        self.thumb_width = thumb_width
+        # (frame index, small BGR frame) สำหรับ UI ดึงไปแสดง
+        self.thumbnails = queue.Queue()
+
+        self._playhead = 0
+        self._moved = threading.Event()
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._prefetch_loop, daemon=True),
+            threading.Thread(target=self._thumbnail_loop, daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+
+    def get_frame(self, index):
+        self.cache.pinned = index
+        frame = self.cache.get(index)
+        if frame is None:
+            frame = self.reader.read_at(index)
+            if frame is not None:
+                self.cache.put(index, frame)
+        return frame
+
+    def set_playhead(self, index):
+        self._playhead = index
+        self._moved.set()
+
+    def close(self):
+        self._stop.set()
+        self._moved.set()
+        for t in self._threads:
+            t.join(timeout=1)
+        self.reader.release()
+
+    # ---------------- background ----------------
+    def _prefetch_loop(self):
+        reader = video_reader(self.segments)
+        while not self._stop.is_set():
+            self._moved.wait()
+            self._moved.clear()
+
+            head = self._playhead
+            # ย้อนหลังก่อน แล้วค่อยข้างหน้า (ทิศที่มักเล่นต่อ) ให้เฟรมข้างหน้าเข้า cache หลังสุด
+            for start, end in ((head - self.behind, head), (head, head + self.ahead)):
+                if not self._fill(reader, max(start, 0), min(end, self.count)):
+                    break
+        reader.release()
+
+    def _fill(self, reader, start, end):
+        """
+        decode ต่อเนื่องตั้งแต่ start ถึง end ใส่ cache; หยุดทันทีถ้า playhead ย้าย
+        """
+        missing = [i for i in range(start, end) if i not in self.cache]
+        if not missing:
+            return True
+
+        reader.seek(missing[0])
+        while reader.pos < missing[-1] + 1:
+            if self._stop.is_set() or self._moved.is_set():
+                return False
+            index, frame = reader.read()
+            if frame is None:
+                return True
+            if index >= start and index not in self.cache:
+                self.cache.put(index, frame)
+        return True
+
+    def _thumbnail_loop(self):
+        if self.count <= 0:
+            return
+        reader = video_reader(self.segments)
+        step = max(self.count // self.thumb_count, 1)
+        last = None
+        for target in range(0, self.count, step):
+            if self._stop.is_set():
+                break
+            # ใช้ keyframe ที่ใกล้ที่สุดจะได้ decode แค่เฟรมเดียว
+            index = reader.keyframe_before(target)
+            if index == last:
+                continue
+            last = index
+            frame = reader.read_at(index)
+            if frame is None:
+                continue
+            h, w = frame.shape[:2]
+            thumb_h = max(int(h * self.thumb_width / w), 1)
+            self.thumbnails.put((index, cv2.resize(frame, (self.thumb_width, thumb_h),
+                                                   interpolation=cv2.INTER_AREA)))
+        reader.release()
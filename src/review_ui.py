@@ -0,0 +1,252 @@
+import queue
+import time
+
+import cv2
+import numpy as np
+
+from PySide6.QtWidgets import (
+    QMainWindow, QVBoxLayout, QHBoxLayout, QSizePolicy, QLabel, QWidget,
+    QSlider, QPushButton, QListWidget, QListWidgetItem, QListView
+)
+from PySide6.QtCore import QTimer, Qt, QSize
+from PySide6.QtGui import QImage, QPixmap, QIcon
+
+# Matplotlib
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+
+import detention_module as dm
+import review_module
+import session_store
+
+
+def to_pixmap(frame):
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    h, w, ch = rgb.shape
+    return QPixmap.fromImage(QImage(rgb.data, w, h, w * ch, QImage.Format_RGB888).copy())
+
+
+# ----------------- Graph with playhead -----------------
+def decimate(frames, values, width):
+    """
+    ลดจำนวนจุดให้เหลือราว 2 จุดต่อ pixel: แต่ละช่วงเก็บค่า min และ max ไว้ (spike ไม่หาย)
+    frames: (N,), values: (N, K) คืน (x, y) ที่มีประมาณ 2 * width แถว
+    """
+    n = len(frames)
+    width = max(int(width), 1)
+    if n <= 2 * width:
+        return frames, values
+    step = -(-n // width)
+    pad = step * width - n
+    x = np.concatenate([frames, np.repeat(frames[-1:], pad)]).reshape(width, step)
+    y = np.concatenate([values, np.repeat(values[-1:], pad, axis=0)]).reshape(width, step, -1)
+    # fmin/fmax ข้าม NaN (มุมที่ถูก mask) โดยไม่เตือน
+    lo, hi = np.fmin.reduce(y, axis=1), np.fmax.reduce(y, axis=1)
+    xs = np.stack([x[:, 0], x[:, -1]], axis=1).reshape(-1)
+    ys = np.stack([lo, hi], axis=1).reshape(-1, values.shape[1])
+    return xs, ys
+
+
+class ReviewGraph:
+    def __init__(self, container_widget, frames, angles):
+        self.fig = Figure(figsize=(6, 2), tight_layout=True)
+        self.canvas = FigureCanvas(self.fig)
+        self.ax = self.fig.add_subplot(111)
+        self.ax.set_ylim(0, 180)
+        self.ax.grid(True, alpha=0.3)
+        self.ax.set_xlabel("Frame")
+
+        # วาดข้อมูลทั้ง session ครั้งเดียว ตอน scrub ขยับแค่เส้น playhead
+        self.frames = frames
+        self.angles = angles
+        self.lines = [self.ax.plot([], [], label=name, linewidth=1)[0]
+                      for name in ("Neck", "Arm", "Body", "Leg")]
+        if len(frames):
+            self.ax.set_xlim(frames[0], frames[-1])
+        self.ax.legend(loc="upper right", fontsize=8)
+        # animated: ไม่ถูกวาดรวมกับพื้นหลัง วาดเองตอน blit
+        self.cursor = self.ax.axvline(0, color="black", linewidth=1, animated=True)
+        self.background = None
+        self._decimate()
+
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+        self.canvas.mpl_connect("resize_event", lambda event: self._decimate())
+
+        layout = QVBoxLayout(container_widget)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.canvas)
+
+    def _decimate(self):
+        if not len(self.frames):
+            return
+        x, y = decimate(self.frames, self.angles, self.canvas.width())
+        for col, line in enumerate(self.lines):
+            line.set_data(x, y[:, col])
+
+    def _on_draw(self, event):
+        # วาดเต็มทุกครั้ง (ครั้งแรก, resize) -> เก็บพื้นหลังไว้ใช้ตอน scrub
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.ax.draw_artist(self.cursor)
+
+    def move(self, frame_index):
+        self.cursor.set_xdata([frame_index, frame_index])
+        if self.background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.background)
+        self.ax.draw_artist(self.cursor)
+        self.canvas.blit(self.fig.bbox)
+
+
+# ----------------- Review window -----------------
+class ReviewWindow(QMainWindow):
+    def __init__(self, video_path, store=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Review - {video_path}")
+        self.resize(1000, 760)
+
+        self.own_store = store is None
+        self.store = session_store.session_store() if self.own_store else store
+        self.store.flush()
+        # เลือกไฟล์ segment ไหนของ session ก็ได้ เปิดทั้ง session ตามลำดับเฟรม
+        self.session_id = self.store.session_for_video(video_path)
+        if self.session_id is not None:
+            segments = self.store.segments_for(self.session_id)
+        else:
+            segments = [(0, video_path)]
+        self.session = review_module.review_session(segments)
+        if self.session_id is not None:
+            frames, ts, angles = self.store.frame_angles(self.session_id)
+        else:
+            frames, ts, angles = np.zeros(0, dtype=int), np.zeros(0), np.zeros((0, 4))
+
+        # เวลาจริงของแต่ละเฟรม (วินาทีจากเฟรมแรก) จาก ts ที่บันทึกไว้
+        # เฟรมที่ไม่มี sample (ไม่เจอ pose) ใช้ค่าประมาณจากเฟรมข้างเคียง
+        # ถ้าไม่มีข้อมูลเลยค่อยใช้ fps ในไฟล์
+        all_frames = np.arange(max(self.session.count, 1))
+        if len(frames) >= 2:
+            self.times = np.interp(all_frames, frames, ts - ts[0])
+        else:
+            self.times = all_frames / self.session.fps
+
+        # widgets
+        central = QWidget()
+        layout = QVBoxLayout(central)
+
+        self.label = QLabel()
+        self.label.setAlignment(Qt.AlignCenter)
+        self.label.setStyleSheet("background:black;")
+        self.label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        layout.addWidget(self.label, 3)
+
+        self.thumbs = QListWidget()
+        self.thumbs.setViewMode(QListView.IconMode)
+        self.thumbs.setFlow(QListView.LeftToRight)
+        self.thumbs.setWrapping(False)
+        self.thumbs.setIconSize(QSize(self.session.thumb_width, self.session.thumb_width * 3 // 4))
+        self.thumbs.setFixedHeight(self.session.thumb_width * 3 // 4 + 30)
+        self.thumbs.itemClicked.connect(lambda item: self.slider.setValue(item.data(Qt.UserRole)))
+        layout.addWidget(self.thumbs)
+
+        controls = QHBoxLayout()
+        self.btnPlay = QPushButton("Play")
+        self.btnPlay.clicked.connect(self.toggle_play)
+        self.slider = QSlider(Qt.Horizontal)
+        self.slider.setRange(0, max(self.session.count - 1, 0))
+        self.slider.valueChanged.connect(self.request_frame)
+        self.lblFrame = QLabel()
+        controls.addWidget(self.btnPlay)
+        controls.addWidget(self.slider, 1)
+        controls.addWidget(self.lblFrame)
+        layout.addLayout(controls)
+
+        graph_widget = QWidget()
+        graph_widget.setMinimumHeight(180)
+        layout.addWidget(graph_widget, 1)
+        self.graph = ReviewGraph(graph_widget, frames, angles)
+
+        self.setCentralWidget(central)
+
+        # ตอนลาก slider เร็วๆ จะมี valueChanged หลายครั้งต่อ event loop
+        # แสดงแค่ตำแหน่งล่าสุดพอ
+        self.pending = None
+        self.render_timer = QTimer(self)
+        self.render_timer.setSingleShot(True)
+        self.render_timer.timeout.connect(self.render_pending)
+
+        # เล่นตามเวลาจริงที่บันทึก ไม่ใช่ทีละเฟรม (เฟรมที่อัดมาไม่ได้ห่างเท่ากัน)
+        self.play_timer = QTimer(self)
+        self.play_timer.timeout.connect(self.play_step)
+        self.play_origin = None
+
+        # thumbnail มาจาก thread ด้านหลัง ดึงมาใส่ใน UI thread
+        self.thumb_timer = QTimer(self)
+        self.thumb_timer.timeout.connect(self.poll_thumbnails)
+        self.thumb_timer.start(100)
+
+        self.request_frame(0)
+        self.show()
+
+    def request_frame(self, index):
+        self.pending = index
+        self.session.set_playhead(index)
+        if not self.render_timer.isActive():
+            self.render_timer.start(0)
+
+    def render_pending(self):
+        index = self.pending
+        frame = self.session.get_frame(index)
+        if frame is None:
+            return
+
+        # landmark ที่บันทึกไว้ วาดบนสำเนา (เฟรมใน cache ต้องคงเป็นภาพดิบ)
+        if self.session_id is not None:
+            points = self.store.landmarks_at(self.session_id, index)
+            if points is not None:
+                frame = dm.draw_landmarks_array(frame.copy(), points)
+
+        pix = to_pixmap(frame).scaled(self.label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self.label.setPixmap(pix)
+        self.lblFrame.setText(f"{index} / {self.session.count - 1}  ({self.time_at(index):.1f}s)")
+        self.graph.move(index)
+
+    def time_at(self, index):
+        return float(self.times[min(max(index, 0), len(self.times) - 1)])
+
+    def toggle_play(self):
+        if self.play_timer.isActive():
+            self.play_timer.stop()
+            self.btnPlay.setText("Play")
+        else:
+            # (เวลาเครื่องตอนกด Play, เวลาในวิดีโอตอนกด Play)
+            self.play_origin = (time.monotonic(), self.time_at(self.slider.value()))
+            self.play_timer.start(15)
+            self.btnPlay.setText("Pause")
+
+    def play_step(self):
+        wall, video = self.play_origin
+        target = video + time.monotonic() - wall
+        index = int(np.searchsorted(self.times, target, side="right")) - 1
+        if index >= self.session.count - 1:
+            self.toggle_play()
+            index = self.session.count - 1
+        if index != self.slider.value():
+            self.slider.setValue(index)
+
+    def poll_thumbnails(self):
+        while True:
+            try:
+                index, thumb = self.session.thumbnails.get_nowait()
+            except queue.Empty:
+                break
+            item = QListWidgetItem(QIcon(to_pixmap(thumb)), f"{self.time_at(index):.0f}s")
+            item.setData(Qt.UserRole, index)
+            self.thumbs.addItem(item)
+
+    def closeEvent(self, event):
+        self.play_timer.stop()
+        self.thumb_timer.stop()
+        self.session.close()
+        if self.own_store:
+            self.store.close()
+        super().closeEvent(event)
@@ -0,0 +1,350 @@
+import math
+import sqlite3
+import time
+
+import numpy as np
+
+JOINTS = ("neck", "arm", "body", "leg")
+
+# histogram ต่อนาที: ช่องละ 5° ตั้งแต่ 0-180°
+BIN_WIDTH = 5
+N_BINS = 36
+BIN_COLS = [f"b{i}" for i in range(N_BINS)]
+
+SCHEMA_VERSION = 3
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    station TEXT NOT NULL,
+    camera TEXT NOT NULL,
+    worker TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    video_path TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_station ON sessions(station, started_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_worker ON sessions(worker, started_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_camera ON sessions(camera, started_at);
+
+CREATE TABLE IF NOT EXISTS samples (
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    ts REAL NOT NULL,
+    neck REAL, arm REAL, body REAL, leg REAL,
+    frame INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_samples_session_ts ON samples(session_id, ts);
+
+-- ไฟล์วิดีโอย่อยของ session: เฟรมที่ first_frame เป็นต้นไปอยู่ในไฟล์ path
+CREATE TABLE IF NOT EXISTS segments (
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    first_frame INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (session_id, first_frame)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_segments_path ON segments(path);
+
+-- landmark ต่อเฟรมของวิดีโอที่อัดไว้ (float32 (33, 4) เป็น bytes)
+CREATE TABLE IF NOT EXISTS landmarks (
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    frame INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (session_id, frame)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS minute_agg (
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    joint TEXT NOT NULL,
+    minute INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    total REAL NOT NULL,
+    mn REAL NOT NULL,
+    mx REAL NOT NULL,
+    {", ".join(f"{c} INTEGER NOT NULL DEFAULT 0" for c in BIN_COLS)},
+    PRIMARY KEY (session_id, joint, minute)
+) WITHOUT ROWID;
+"""
+
+
+def angle_bin(angle):
+    return min(max(int(angle // BIN_WIDTH), 0), N_BINS - 1)
+
+
+class session_store():
+    """
+    เก็บมุมจาก update_anglesA/B ลง SQLite
+    - samples: ข้อมูลดิบทุกเฟรม (ปิดได้ด้วย keep_raw=False)
+    - minute_agg: สรุปต่อนาทีต่อข้อต่อ (n, sum, min, max, histogram) ใช้ตอบ query
+      โดยไม่ต้องสแกนข้อมูลดิบ
+    """
+
+    def __init__(self, path="sessions.db", keep_raw=True, batch_size=300):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self.db.executescript(SCHEMA)
+        self.db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self.db.commit()
+
+        self.keep_raw = keep_raw
+        self.batch_size = batch_size
+        self._raw = []
+        self._landmarks = []
+        # (session_id, joint, minute) -> [n, total, mn, mx, bins]
+        self._agg = {}
+
+    def _migrate(self):
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version == 1:
+            self.db.execute("ALTER TABLE sessions ADD COLUMN video_path TEXT")
+            self.db.execute("ALTER TABLE samples ADD COLUMN frame INTEGER")
+
+    # ---------------- ingest ----------------
+    def start_session(self, station, camera, worker, started_at=None, video_path=None):
+        if started_at is None:
+            started_at = time.time()
+        cur = self.db.execute(
+            "INSERT INTO sessions (station, camera, worker, started_at, video_path) VALUES (?, ?, ?, ?, ?)",
+            (station, camera, worker, started_at, video_path),
+        )
+        self.db.commit()
+        return cur.lastrowid
+
+    def set_video(self, session_id, video_path):
+        self.db.execute("UPDATE sessions SET video_path = ? WHERE id = ?", (video_path, session_id))
+        self.db.commit()
+
+    def add_segment(self, session_id, first_frame, path):
+        self.db.execute(
+            "INSERT OR REPLACE INTO segments (session_id, first_frame, path) VALUES (?, ?, ?)",
+            (session_id, first_frame, path),
+        )
+        self.db.commit()
+
+    def add_sample(self, session_id, neck, arm, body, leg, ts=None, frame=None):
+        if ts is None:
+            ts = time.time()
+        values = (neck, arm, body, leg)
+
+        if self.keep_raw:
+            self._raw.append((session_id, ts, *values, frame))
+
+        minute = int(ts // 60)
+        for joint, v in zip(JOINTS, values):
+            if v is None or math.isnan(v):
+                continue
+            key = (session_id, joint, minute)
+            agg = self._agg.get(key)
+            if agg is None:
+                agg = self._agg[key] = [0, 0.0, v, v, [0] * N_BINS]
+            agg[0] += 1
+            agg[1] += v
+            agg[2] = min(agg[2], v)
+            agg[3] = max(agg[3], v)
+            agg[4][angle_bin(v)] += 1
+
+        if len(self._raw) >= self.batch_size or len(self._agg) >= self.batch_size:
+            self.flush()
+
+    def add_landmarks(self, session_id, frame, points):
+        self._landmarks.append((session_id, frame, np.asarray(points, dtype=np.float32).tobytes()))
+        if len(self._landmarks) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._raw and not self._agg and not self._landmarks:
+            return
+
+        if self._raw:
+            self.db.executemany(
+                "INSERT INTO samples (session_id, ts, neck, arm, body, leg, frame) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._raw,
+            )
+
+        if self._landmarks:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO landmarks (session_id, frame, data) VALUES (?, ?, ?)",
+                self._landmarks,
+            )
+
+        if self._agg:
+            # นาทีเดียวกันอาจถูก flush หลายครั้ง จึงรวมค่าเข้ากับแถวเดิม
+            cols = ", ".join(BIN_COLS)
+            marks = ", ".join("?" * N_BINS)
+            merge = ", ".join(f"{c} = {c} + excluded.{c}" for c in BIN_COLS)
+            self.db.executemany(
+                f"""
+                INSERT INTO minute_agg (session_id, joint, minute, n, total, mn, mx, {cols})
+                VALUES (?, ?, ?, ?, ?, ?, ?, {marks})
+                ON CONFLICT (session_id, joint, minute) DO UPDATE SET
+                    n = n + excluded.n,
+                    total = total + excluded.total,
+                    mn = MIN(mn, excluded.mn),
+                    mx = MAX(mx, excluded.mx),
+                    {merge}
+                """,
+                [(*key, n, total, mn, mx, *bins) for key, (n, total, mn, mx, bins) in self._agg.items()],
+            )
+
+        self.db.commit()
+        self._raw.clear()
+        self._agg.clear()
+        self._landmarks.clear()
+
+    def end_session(self, session_id, ended_at=None):
+        if ended_at is None:
+            ended_at = time.time()
+        self.flush()
+        self.db.execute("UPDATE sessions SET ended_at = ? WHERE id = ?", (ended_at, session_id))
+        self.db.commit()
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    # ---------------- query ----------------
+    def time_above(self, joint, threshold, start=None, end=None, group_by="station",
+                   station=None, camera=None, worker=None):
+        """
+        สัดส่วนเวลาที่มุมของ joint เกิน threshold แยกตาม group_by
+        (station / camera / worker / session)
+        threshold ถูกปัดขึ้นเป็นขอบช่อง histogram ถัดไป (ทีละ BIN_WIDTH = 5°)
+        และ "เกิน" หมายถึง >= ขอบนั้น เช่น threshold 43 -> นับมุม >= 45°
+        คืนค่า list ของ (key, fraction, samples)
+        """
+        if joint not in JOINTS:
+            raise ValueError(f"unknown joint: {joint}")
+        group_cols = {"station": "s.station", "camera": "s.camera",
+                      "worker": "s.worker", "session": "s.id"}
+        if group_by not in group_cols:
+            raise ValueError(f"unknown group_by: {group_by}")
+
+        first_bin = min(max(math.ceil(threshold / BIN_WIDTH), 0), N_BINS)
+        above = " + ".join(f"a.{c}" for c in BIN_COLS[first_bin:]) or "0"
+
+        where = ["a.joint = ?"]
+        params = [joint]
+        if start is not None:
+            where.append("a.minute >= ?")
+            params.append(int(start // 60))
+        if end is not None:
+            where.append("a.minute < ?")
+            params.append(math.ceil(end / 60))
+        for col, value in (("station", station), ("camera", camera), ("worker", worker)):
+            if value is not None:
+                where.append(f"s.{col} = ?")
+                params.append(value)
+
+        key = group_cols[group_by]
+        rows = self.db.execute(
+            f"""
+            SELECT {key}, SUM({above}), SUM(a.n)
+            FROM minute_agg a JOIN sessions s ON s.id = a.session_id
+            WHERE {" AND ".join(where)}
+            GROUP BY {key}
+            ORDER BY {key}
+            """,
+            params,
+        ).fetchall()
+
+        return [(k, hi / n if n else 0.0, n) for k, hi, n in rows]
+
+    def groups_over(self, joint, threshold, fraction, start=None, end=None, group_by="station",
+                    station=None, camera=None, worker=None):
+        """
+        เช่น station ไหนมีเวลาคอเกิน 45° มากกว่า 20% ของ worker "w01":
+        groups_over("neck", 45, 0.2, start=time.time() - 7 * 86400, worker="w01")
+        threshold ถูกปัดขึ้นเป็นขอบช่อง 5° และนับมุม >= ขอบนั้น (ดู time_above)
+        """
+        rows = self.time_above(joint, threshold, start, end, group_by,
+                               station=station, camera=camera, worker=worker)
+        return [row for row in rows if row[1] > fraction]
+
+    def minute_stats(self, session_id, joint):
+        """
+        ค่าเฉลี่ย/ต่ำสุด/สูงสุดรายนาทีของ session (สำหรับวาดกราฟย้อนหลัง)
+        """
+        return self.db.execute(
+            """
+            SELECT minute * 60, total / n, mn, mx FROM minute_agg
+            WHERE session_id = ? AND joint = ? ORDER BY minute
+            """,
+            (session_id, joint),
+        ).fetchall()
+
+    # ---------------- review ----------------
+    def session_for_video(self, video_path):
+        """
+        หา session จากไฟล์วิดีโอ (segment ไหนก็ได้ของ session หรือ video_path แบบไฟล์เดียวของ schema v2)
+        """
+        row = self.db.execute(
+            "SELECT session_id FROM segments WHERE path = ? ORDER BY session_id DESC LIMIT 1", (video_path,)
+        ).fetchone()
+        if row is None:
+            row = self.db.execute(
+                "SELECT id FROM sessions WHERE video_path = ? ORDER BY id DESC LIMIT 1", (video_path,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def segments_for(self, session_id):
+        """
+        ไฟล์วิดีโอของ session เรียงตามเฟรม [(first_frame, path), ...]
+        """
+        rows = self.db.execute(
+            "SELECT first_frame, path FROM segments WHERE session_id = ? ORDER BY first_frame",
+            (session_id,),
+        ).fetchall()
+        if rows:
+            return rows
+        row = self.db.execute("SELECT video_path FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return [(0, row[0])] if row and row[0] else []
+
+    def landmarks_at(self, session_id, frame):
+        row = self.db.execute(
+            "SELECT data FROM landmarks WHERE session_id = ? AND frame = ?", (session_id, frame)
+        ).fetchone()
+        if row is None:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32).reshape(-1, 4)
+
+    def frame_angles(self, session_id):
+        """
+        มุมต่อเฟรมของวิดีโอ: (frames, ts, angles) โดย angles มีคอลัมน์ neck, arm, body, leg
+        ts คือเวลาที่ได้เฟรมนั้นจริง (fps ในไฟล์วิดีโอเป็นแค่ค่าประมาณ)
+        """
+        rows = self.db.execute(
+            """
+            SELECT frame, ts, neck, arm, body, leg FROM samples
+            WHERE session_id = ? AND frame IS NOT NULL ORDER BY frame
+            """,
+            (session_id,),
+        ).fetchall()
+        if not rows:
+            return np.zeros(0, dtype=int), np.zeros(0), np.zeros((0, len(JOINTS)))
+        data = np.array(rows, dtype=float)
+        return data[:, 0].astype(int), data[:, 1], data[:, 2:]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="posture report from the session store")
+    parser.add_argument("--db", default="sessions.db")
+    parser.add_argument("--joint", default="neck", choices=JOINTS)
+    parser.add_argument("--above", type=float, default=45)
+    parser.add_argument("--fraction", type=float, default=0.2)
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--by", default="station", choices=["station", "camera", "worker", "session"])
+    parser.add_argument("--station")
+    parser.add_argument("--camera")
+    parser.add_argument("--worker")
+    args = parser.parse_args()
+
+    store = session_store(args.db)
+    since = time.time() - args.days * 86400
+    rows = store.groups_over(args.joint, args.above, args.fraction, since, group_by=args.by,
+                             station=args.station, camera=args.camera, worker=args.worker)
+    for key, frac, n in rows:
+        print(f"{key}\t{frac * 100:.1f}%\t{n} samples")
+    store.close()
@@ -2,9 +2,12 @@
 import sys
 import cv2
 import math
+import os
+import socket
+import time
 
 from PySide6.QtWidgets import (
-    QApplication, QMainWindow, QVBoxLayout, QSizePolicy, QLabel, QWidget
+    QApplication, QMainWindow, QVBoxLayout, QSizePolicy, QLabel, QWidget, QFileDialog
 )
 from PySide6.QtUiTools import QUiLoader
 from PySide6.QtCore import QTimer, Qt
@@ -15,12 +18,20 @@ from collections import deque
 import detention_module as dm
 import camera
 import cal
+import session_store
+import review_ui
+import filter_module
 
 # Matplotlib
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 
-mp_pose = dm.module_detection().mp_pose  # use same namespace as detention_module
+RECORD_DIR = os.path.abspath("recordings")
+
+
+def fmt_angle(angle):
+    # nan = ข้อต่อถูก mask เพราะมองไม่เห็น
+    return "--" if math.isnan(angle) else f"{angle:.1f}°"
 
 
 # ----------------- Angle helper (kept simple) -----------------
@@ -90,13 +101,17 @@ class WorkStudyCamera(QMainWindow):
             raise FileNotFoundError(f"UI file not found or failed to load: {ui_path}")
         self.setCentralWidget(self.ui)
 
-        # modules
+        # modules (ตั้งค่าแยกต่อกล้องได้ เช่น camera.camera_module(width=1280, height=720, exposure="lock"))
         self.cameraA = camera.camera_module()
         self.cameraB = camera.camera_module()
         # use separate mediapipe instances via detention_module
         self.detectorA = dm.module_detection()
         self.detectorB = dm.module_detection()
         self.cal = cal.Cal_function()
+        # กรอง jitter ของ landmark แยกต่อกล้อง
+        self.filterA = filter_module.landmark_filter()
+        self.filterB = filter_module.landmark_filter()
+        self.store = session_store.session_store()
 
         # UI references (must exist in your main.ui)
         self.labelA = self.ui.findChild(QLabel, "labelCameraA")
@@ -108,8 +123,15 @@ class WorkStudyCamera(QMainWindow):
         self.lblActiveA = self.ui.lblActiveCamA
         self.lblActiveB = self.ui.lblActiveCamB
 
+        self.editStation = self.ui.editStation
+        self.editWorker = self.ui.editWorker
+        self.editStation.setText(socket.gethostname())
+        # อัดวิดีโอไว้ review (ปิดไว้เป็นค่าเริ่มต้น)
+        self.chkRecord = self.ui.chkRecord
+
         self.btnStart = self.ui.btnStart
         self.btnStop = self.ui.btnStop
+        self.btnReview = self.ui.btnReview
 
         # set scaled contents
         for lbl in (self.labelA, self.labelB):
@@ -124,6 +146,10 @@ class WorkStudyCamera(QMainWindow):
         self.capA = None
         self.capB = None
 
+        # session id ใน session_store ของแต่ละกล้อง (None = ยังไม่ได้บันทึก)
+        self.sessionA = None
+        self.sessionB = None
+
         # timers
         self.timerA = QTimer(self)
         self.timerB = QTimer(self)
@@ -136,6 +162,8 @@ class WorkStudyCamera(QMainWindow):
         # connect buttons
         self.btnStart.clicked.connect(self.start_both)
         self.btnStop.clicked.connect(self.stop_both)
+        self.btnReview.clicked.connect(self.open_review)
+        self.review = None
 
         # show
         self.show()
@@ -146,7 +174,7 @@ class WorkStudyCamera(QMainWindow):
         self.comboA.clear()
         self.comboB.clear()
         for i in range(max_scan):
-            cap = cv2.VideoCapture(i)
+            cap = cv2.VideoCapture(i, camera.default_backend())
             if cap.isOpened():
                 self.comboA.addItem(f"Camera {i}", i)
                 self.comboB.addItem(f"Camera {i}", i)
@@ -170,7 +198,10 @@ class WorkStudyCamera(QMainWindow):
                 pass
             self.cameraA.add_camera(idxA)
             if self.cameraA.isopen_cam():
-                self.lblActiveA.setText(f"Active: Camera {idxA}")
+                self.lblActiveA.setText(f"Active: Camera {idxA} ({self.cameraA.mode_text()})")
+                self.sessionA = self._start_session(f"A:{idxA}", self.sessionA)
+                self.filterA.reset()
+                self._start_record(self.cameraA, self.sessionA, "A")
                 self.timerA.start(30)
             else:
                 self.lblActiveA.setText("Active: Failed")
@@ -187,7 +218,10 @@ class WorkStudyCamera(QMainWindow):
                 pass
             self.cameraB.add_camera(idxB)
             if self.cameraB.isopen_cam():
-                self.lblActiveB.setText(f"Active: Camera {idxB}")
+                self.lblActiveB.setText(f"Active: Camera {idxB} ({self.cameraB.mode_text()})")
+                self.sessionB = self._start_session(f"B:{idxB}", self.sessionB)
+                self.filterB.reset()
+                self._start_record(self.cameraB, self.sessionB, "B")
                 self.timerB.start(30)
             else:
                 self.lblActiveB.setText("Active: Failed")
@@ -195,6 +229,8 @@ class WorkStudyCamera(QMainWindow):
     def stop_both(self):
         self.timerA.stop()
         self.timerB.stop()
+        self.cameraA.stop_record()
+        self.cameraB.stop_record()
         try:
             if self.cameraA.cap and self.cameraA.cap.isOpened():
                 self.cameraA.cap_release()
@@ -206,22 +242,68 @@ class WorkStudyCamera(QMainWindow):
         except Exception:
             pass
 
+        for session in (self.sessionA, self.sessionB):
+            if session is not None:
+                self.store.end_session(session)
+        self.sessionA = None
+        self.sessionB = None
+
         self.labelA.clear()
         self.labelB.clear()
         self.lblActiveA.setText("Active: None")
         self.lblActiveB.setText("Active: None")
 
+    def _start_session(self, camera_name, previous=None):
+        # กด Start ซ้ำขณะกำลังบันทึก -> ปิด session เดิมก่อน
+        if previous is not None:
+            self.store.end_session(previous)
+        return self.store.start_session(
+            self.editStation.text().strip() or socket.gethostname(),
+            camera_name,
+            self.editWorker.text().strip(),
+        )
+
+    def _start_record(self, cam, session, name):
+        cam.stop_record()
+        if not self.chkRecord.isChecked():
+            return
+        os.makedirs(RECORD_DIR, exist_ok=True)
+        cam.start_record(os.path.join(RECORD_DIR, f"session{session}_{name}"))
+
+    def _record_frame(self, cam, session, frame):
+        cam.write_record(frame)
+        # segment ใหม่ -> บันทึกลง DB ทันที ถ้าโปรแกรม crash ก็ยังเปิด review ได้
+        for first_frame, path in cam.pop_segment():
+            self.store.add_segment(session, first_frame, path)
+
+    def open_review(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open recording", RECORD_DIR, "Video (*.avi)")
+        if not path:
+            return
+        if self.review is not None:
+            self.review.close()
+        self.review = review_ui.ReviewWindow(os.path.abspath(path), self.store)
+
+    def closeEvent(self, event):
+        if self.review is not None:
+            self.review.close()
+        self.stop_both()
+        self.store.close()
+        super().closeEvent(event)
+
     # ---------------- frame loop A ----------------
     def update_frameA(self):
         frame = self.cameraA.chcel_camera()
         if frame is None:
             return
+        # อัดภาพดิบก่อนที่ detector จะวาดโครงร่างทับ
+        self._record_frame(self.cameraA, self.sessionA, frame)
 
         rgb = self.cameraA.color_images()  # returns RGB ndarray
-        ok, lm = self.detectorA.process_images(frame, rgb)
+        ok, lm = self.detectorA.process_images(frame, rgb, draw=False)
         # detector returns (True, landmarks) or (False, imagesRGB)
         if ok:
-            # process landmarks -> detector draws on frame already
+            # process landmarks -> วาดโครงร่างที่กรองแล้วลงบน frame
             self.update_anglesA(lm, frame)
 
         self._display_frame(self.labelA, frame)
@@ -231,9 +313,10 @@ class WorkStudyCamera(QMainWindow):
         frame = self.cameraB.chcel_camera()
         if frame is None:
             return
+        self._record_frame(self.cameraB, self.sessionB, frame)
 
         rgb = self.cameraB.color_images()
-        ok, lm = self.detectorB.process_images(frame, rgb)
+        ok, lm = self.detectorB.process_images(frame, rgb, draw=False)
         if ok:
             self.update_anglesB(lm, frame)
 
@@ -241,7 +324,7 @@ class WorkStudyCamera(QMainWindow):
 
     # ---------------- display helper ----------------
     def _display_frame(self, label, frame):
-        # frame assumed BGR with landmarks drawn by detector
+        # frame assumed BGR with filtered landmarks drawn by update_anglesX
         try:
             frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         except Exception:
@@ -252,75 +335,63 @@ class WorkStudyCamera(QMainWindow):
         pix = pix.scaled(label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
         label.setPixmap(pix)
 
-    # ---------------- angle calc A ----------------
-    def update_anglesA(self, lm, frame):
+    # ---------------- landmark filter ----------------
+    def filter_angles(self, filt, points, frame):
+        """
+        กรอง landmark (One Euro + mask จุดที่ visibility ต่ำ) แล้วคำนวณมุม
+        points ถูกแทนที่ด้วยตำแหน่งที่กรองแล้ว เพื่อให้ข้อมูลที่บันทึกตรงกับมุม
+        """
         h, w, _ = frame.shape
-        p = lm.landmark
-
-        def g(i): return int(p[i].x * w), int(p[i].y * h)
-
-        neck = g(mp_pose.PoseLandmark.NOSE)
-        ls = g(mp_pose.PoseLandmark.LEFT_SHOULDER)
-        rs = g(mp_pose.PoseLandmark.RIGHT_SHOULDER)
-        center = ((ls[0] + rs[0]) // 2, (ls[1] + rs[1]) // 2)
-        neck_angle = self.cal.angle_3pt(ls, center, neck)
+        xy, mask = filt.filter(points[:, :2] * (w, h), points[:, 3], time.monotonic())
+        points[:, :2] = xy / (w, h)
+        return self.cal.pose_angles(xy, mask)
 
-        elbow = g(mp_pose.PoseLandmark.LEFT_ELBOW)
-        wrist = g(mp_pose.PoseLandmark.LEFT_WRIST)
-        arm_angle = self.cal.angle_3pt(ls, elbow, wrist)
-
-        hip = g(mp_pose.PoseLandmark.LEFT_HIP)
-        body_angle = abs(math.degrees(math.atan2(center[0] - hip[0], center[1] - hip[1])))
-
-        knee = g(mp_pose.PoseLandmark.LEFT_KNEE)
-        ankle = g(mp_pose.PoseLandmark.LEFT_ANKLE)
-        leg_angle = self.cal.angle_3pt(hip, knee, ankle)
+    # ---------------- angle calc A ----------------
+    def update_anglesA(self, lm, frame):
+        points = dm.landmarks_array(lm)
+        neck_angle, arm_angle, body_angle, leg_angle = self.filter_angles(self.filterA, points, frame)
+        # โครงร่างบนภาพ live ใช้จุดที่กรองและ mask แล้ว ตรงกับมุมและภาพตอน review
+        dm.draw_landmarks_array(frame, points, self.filterA.min_visibility)
 
         # update UI labels (optional: you can add separate label group for each camera)
         try:
-            self.ui.lblNeckA.setText(f"Neck A: {neck_angle:.1f}°")
-            self.ui.lblArmA.setText(f"Arm A: {arm_angle:.1f}°")
-            self.ui.lblBodyA.setText(f"Body A: {body_angle:.1f}°")
-            self.ui.lblLegA.setText(f"Leg A: {leg_angle:.1f}°")
+            self.ui.lblNeckA.setText(f"Neck A: {fmt_angle(neck_angle)}")
+            self.ui.lblArmA.setText(f"Arm A: {fmt_angle(arm_angle)}")
+            self.ui.lblBodyA.setText(f"Body A: {fmt_angle(body_angle)}")
+            self.ui.lblLegA.setText(f"Leg A: {fmt_angle(leg_angle)}")
         except Exception:
             pass
 
+        if self.sessionA is not None:
+            frame_no = self.cameraA.frame_index
+            self.store.add_sample(self.sessionA, neck_angle, arm_angle, body_angle, leg_angle, frame=frame_no)
+            if frame_no is not None:
+                self.store.add_landmarks(self.sessionA, frame_no, points)
+
         # push to graph A
         self.graphA.push(neck_angle, arm_angle, body_angle, leg_angle)
 
     # ---------------- angle calc B ----------------
     def update_anglesB(self, lm, frame):
-        h, w, _ = frame.shape
-        p = lm.landmark
-
-        def g(i): return int(p[i].x * w), int(p[i].y * h)
-
-        neck = g(mp_pose.PoseLandmark.NOSE)
-        ls = g(mp_pose.PoseLandmark.LEFT_SHOULDER)
-        rs = g(mp_pose.PoseLandmark.RIGHT_SHOULDER)
-        center = ((ls[0] + rs[0]) // 2, (ls[1] + rs[1]) // 2)
-        neck_angle = self.cal.angle_3pt(ls, center, neck)
-
-        elbow = g(mp_pose.PoseLandmark.LEFT_ELBOW)
-        wrist = g(mp_pose.PoseLandmark.LEFT_WRIST)
-        arm_angle = self.cal.angle_3pt(ls, elbow, wrist)
-
-        hip = g(mp_pose.PoseLandmark.LEFT_HIP)
-        body_angle = abs(math.degrees(math.atan2(center[0] - hip[0], center[1] - hip[1])))
-
-        knee = g(mp_pose.PoseLandmark.LEFT_KNEE)
-        ankle = g(mp_pose.PoseLandmark.LEFT_ANKLE)
-        leg_angle = self.cal.angle_3pt(hip, knee, ankle)
+        points = dm.landmarks_array(lm)
+        neck_angle, arm_angle, body_angle, leg_angle = self.filter_angles(self.filterB, points, frame)
+        dm.draw_landmarks_array(frame, points, self.filterB.min_visibility)
 
         # update UI labels (optional)
         try:
-            self.ui.lblNeckB.setText(f"Neck B: {neck_angle:.1f}°")
-            self.ui.lblArmB.setText(f"Arm B: {arm_angle:.1f}°")
-            self.ui.lblBodyB.setText(f"Body B: {body_angle:.1f}°")
-            self.ui.lblLegB.setText(f"Leg B: {leg_angle:.1f}°")
+            self.ui.lblNeckB.setText(f"Neck B: {fmt_angle(neck_angle)}")
+            self.ui.lblArmB.setText(f"Arm B: {fmt_angle(arm_angle)}")
+            self.ui.lblBodyB.setText(f"Body B: {fmt_angle(body_angle)}")
+            self.ui.lblLegB.setText(f"Leg B: {fmt_angle(leg_angle)}")
         except Exception:
             pass
 
+        if self.sessionB is not None:
+            frame_no = self.cameraB.frame_index
+            self.store.add_sample(self.sessionB, neck_angle, arm_angle, body_angle, leg_angle, frame=frame_no)
+            if frame_no is not None:
+                self.store.add_landmarks(self.sessionB, frame_no, points)
+
         # push to graph B
         self.graphB.push(neck_angle, arm_angle, body_angle, leg_angle)
 